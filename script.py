@@ -3,23 +3,35 @@
 # dependencies = [
 #     "click>=8.1.7",
 #     "rich>=13.7.0",
-#     "pydantic>=2.5.0",
-#     "requests>=2.31.0"
+#     "requests>=2.31.0",
+#     "orjson>=3.9.0"
 # ]
 # ///
 
-from typing import List, Optional, Generator, Any
+from typing import List, Optional, Generator, Iterable, Any, BinaryIO
+from dataclasses import dataclass
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future
 import click
 from rich.console import Console
 from rich.table import Table
-from pydantic import BaseModel
+from rich.text import Text
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import re
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
 from pathlib import Path
 import logging
 from rich.logging import RichHandler
+import os
+import stat
 import time
-from datetime import datetime
+from operator import itemgetter
 
 # Configure logging
 logging.basicConfig(
@@ -32,11 +44,77 @@ logger = logging.getLogger("github_marketplace")
 
 console = Console()
 
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+SPECULATIVE_REQUEST_TIMEOUT = (3, 10)  # Prefetches are retried normally if actually needed
+PREFETCH_WORKERS = 4  # Maximum number of pages fetched concurrently
+PAGE_SIZE = 20  # GitHub usually returns 20 items per page
+
+def _create_session(pool_maxsize: int, max_retries: Retry | int) -> requests.Session:
+    """Create an HTTP session with keep-alive pooling for github.com."""
+    session = requests.Session()
+    session.headers.update({
+        "Accept": "application/json",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+    })
+    session.mount("https://", HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries
+    ))
+    return session
+
+# Shared HTTP session so paginated requests reuse the same keep-alive connection
+_SESSION = _create_session(
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+)
+# Prefetch workers use their own session without retries, so a request for a
+# page past the end of the listing cannot stretch the run
+_SPECULATIVE_SESSION = _create_session(pool_maxsize=PREFETCH_WORKERS, max_retries=0)
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session used for marketplace requests."""
+    return _SESSION
+
+def json_loads(data: bytes) -> Any:
+    """Decode JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Characters json.dumps escapes by default (ensure_ascii) but orjson writes raw
+_NON_ASCII = re.compile(r'[^\x00-\x7e]')
+
+def _escape_non_ascii(match: re.Match) -> str:
+    """Escape one character the way json.dumps does, using surrogate pairs above the BMP."""
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u{0:04x}\\u{1:04x}'.format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u{0:04x}'.format(code)
+
+def json_dumps(data: Any) -> bytes:
+    """
+    Encode data as indented ASCII JSON bytes, using orjson when available.
+
+    Output matches json.dumps(data, indent=2) so models.json keeps the same
+    encoding whichever encoder is installed.
+    """
+    if orjson is None:
+        return json.dumps(data, indent=2).encode('ascii')
+
+    encoded = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    if encoded.isascii():
+        return encoded
+    # Non-ASCII can only occur inside strings, so escaping it in place is safe
+    return _NON_ASCII.sub(_escape_non_ascii, encoded.decode('utf-8')).encode('ascii')
+
 class CacheError(Exception):
     """Custom exception for cache-related errors."""
     pass
 
-class GithubModels(BaseModel):
+@dataclass(slots=True, frozen=True)
+class GithubModels:
     """Configuration for GitHub models fetching."""
     GITHUB_MARKETPLACE_BASE_URL: str = "https://github.com/marketplace"
     model_family: Optional[str] = None
@@ -51,130 +129,213 @@ def get_cache_path(config: GithubModels, page: int) -> Path:
         cache_key += f"_{config.model_family}"
     return config.cache_dir / f"{cache_key}.json"
 
-def load_cached_data(cache_path: Path, cache_timeout: int) -> Optional[dict]:
-    """Load data from cache if it exists and is not expired."""
+def _load_parsed(cache_path: Path) -> dict:
+    """Read and parse a cache file."""
+    # Open by fd to skip the buffered-IO machinery of open(); the caller has
+    # already stat'ed the path
+    with os.fdopen(os.open(cache_path, os.O_RDONLY), 'rb', buffering=0) as f:
+        return json_loads(f.read())
+
+def _read_cache_raw(cache_path: Path, cache_timeout: float) -> tuple[Optional[dict], bool]:
+    """
+    Read a cache file in a single pass.
+
+    Returns the parsed data (None if missing or unreadable) together with
+    whether it is older than cache_timeout, so callers can still fall back
+    to expired data without reading the file again.
+    """
     try:
-        if not cache_path.is_file():
-            return None
+        try:
+            st = os.stat(cache_path)
+        except FileNotFoundError:
+            return None, True
+        if not stat.S_ISREG(st.st_mode):
+            return None, True
 
         # Check cache age
-        mod_time = cache_path.stat().st_mtime
-        if time.time() - mod_time > cache_timeout:
+        expired = time.time() - st.st_mtime > cache_timeout
+        if expired:
             logger.debug(f"Cache expired for {cache_path}")
-            return None
 
-        logger.info(f"Using cached data from: {cache_path}")
-        with cache_path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
-            logger.debug(f"Successfully loaded cache from {cache_path}")
-            return data
+        data = _load_parsed(cache_path)
+        logger.debug(f"Successfully loaded cache from {cache_path}")
+        return data, expired
 
     except Exception as e:
         logger.warning(f"Error loading cache {cache_path}: {str(e)}")
-        return None
+        return None, True
 
 def save_to_cache(data: Any, cache_path: Path) -> None:
     """Save data to cache file."""
     try:
         cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with cache_path.open('w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        with cache_path.open('wb') as f:
+            f.write(json_dumps(data))
         logger.debug(f"Saved to cache: {cache_path}")
     except Exception as e:
         logger.error(f"Error saving to cache {cache_path}: {str(e)}")
         raise CacheError(f"Failed to save cache: {str(e)}")
 
-def fetch_page_with_cache(url: str, params: dict, headers: dict, cache_path: Path, cache_timeout: int) -> tuple[List[dict], bool]:
-    """Fetch a page with caching support."""
-    # Try to load from cache first
-    cached_data = load_cached_data(cache_path, cache_timeout)
-    if cached_data is not None:
-        logger.debug("Using cached data")
+def fetch_page_with_cache(url: str, params: dict, cache_path: Path, cache_timeout: int,
+                          speculative: bool = False) -> tuple[List[dict], bool]:
+    """
+    Fetch a page with caching support.
+
+    Speculative fetches use a short timeout without retries and give up
+    instead of falling back to expired cache; the caller fetches the page
+    again normally if it turns out to be needed.
+    """
+    # Try to load from cache first; keep expired data around as a fallback
+    cached_data, expired = _read_cache_raw(cache_path, cache_timeout)
+    if cached_data is not None and not expired:
+        logger.info(f"Using cached data from: {cache_path}")
         return cached_data.get("models", []), cached_data.get("has_next_page", False)
+    stale_data = cached_data
+
+    # Revalidate expired cache with a conditional request when possible
+    conditional_headers = {}
+    if stale_data is not None:
+        if stale_data.get("etag"):
+            conditional_headers["If-None-Match"] = stale_data["etag"]
+        if stale_data.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = stale_data["last_modified"]
 
     # If no cache or expired, fetch from API
     try:
         logger.debug(f"Making request to {url} with params: {params}")
-        response = requests.get(url, headers=headers, params=params)
+        if speculative:
+            response = _SPECULATIVE_SESSION.get(
+                url, params=params, headers=conditional_headers, timeout=SPECULATIVE_REQUEST_TIMEOUT
+            )
+        else:
+            response = _SESSION.get(url, params=params, headers=conditional_headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         logger.debug(f"Response status code: {response.status_code}")
+        if response.status_code == 304 and stale_data is not None:
+            # Page unchanged: refresh the cache age without rewriting the file
+            logger.debug(f"Cache revalidated for {cache_path}")
+            os.utime(cache_path)
+            return stale_data.get("models", []), stale_data.get("has_next_page", False)
+
         logger.debug(f"Response headers: {response.headers}")
         # Log first 1000 chars to avoid huge logs
         logger.debug(f"Raw response: {response.text[:1000]}...")
         
-        data = response.json()
+        data = json_loads(response.content)
         models = data.get("results", [])
 
         # Check if there's a next page by looking at the response
-        # GitHub usually returns 20 items per page
-        has_next_page = bool(data.get("next_page_url") or (len(models) == 20))
+        has_next_page = bool(data.get("next_page_url") or (len(models) == PAGE_SIZE))
 
         # Save to cache
         cache_data = {
             "models": models,
             "has_next_page": has_next_page,
-            "cached_at": datetime.now().isoformat()
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "cached_at_ns": time.time_ns()
         }
         save_to_cache(cache_data, cache_path)
         
         return models, has_next_page
 
     except Exception as e:
+        if speculative:
+            logger.debug(f"Speculative fetch failed: {str(e)}")
+            raise CacheError(f"Speculative fetch failed for {cache_path}") from e
+
         logger.error(f"Error fetching page: {str(e)}")
         
         # If fetch fails but we have expired cache, use it as fallback
-        if cache_path.exists():
+        if stale_data is not None:
             logger.warning("Fetch failed, using expired cache as fallback")
-            cached_data = load_cached_data(cache_path, float('inf'))  # Ignore timeout for fallback
-            if cached_data:
-                return cached_data.get("models", []), cached_data.get("has_next_page", False)
-            
+            return stale_data.get("models", []), stale_data.get("has_next_page", False)
+
         raise CacheError(f"Failed to fetch data and no cache available at {cache_path}")
 
+class PageFetcher:
+    """
+    Fetch pages of one marketplace listing.
+
+    Everything that is constant across pages is resolved once when the
+    fetcher is created, so each fetch(page) call, including those made from
+    prefetch workers, only has to fill in the page number.
+    """
+    __slots__ = ('config', 'url', 'cache_timeout', 'base_params')
+
+    def __init__(self, config: GithubModels):
+        self.config = config
+        self.url = config.GITHUB_MARKETPLACE_BASE_URL
+        self.cache_timeout = config.cache_timeout
+        self.base_params = {"type": config.type}
+        if config.model_family:
+            self.base_params["model_family"] = config.model_family
+
+    def fetch(self, page: int, speculative: bool = False) -> tuple[List[dict], bool]:
+        """Fetch a single page, using the cache when possible."""
+        # base_params is shared with prefetch workers, so copy rather than mutate it
+        return fetch_page_with_cache(
+            self.url,
+            {**self.base_params, "page": page},
+            get_cache_path(self.config, page),
+            self.cache_timeout,
+            speculative
+        )
+
 def get_marketplace_models(config: GithubModels) -> Generator[dict, None, None]:
     """
     Fetch all models from GitHub marketplace using pagination and caching.
+
+    The first page is fetched synchronously. After each full page, following
+    pages are prefetched concurrently, starting one page ahead and doubling
+    the window (up to PREFETCH_WORKERS) while pages keep coming back full.
+    Models are always yielded in page order.
     
     Args:
         config: GithubModels configuration
         
     Yields:
         Models one at a time as they are fetched
-    """    
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
-    }
-    
+    """
+    fetcher = PageFetcher(config)
     page = 1
     total_models = 0
-    
-    while True:
-        params = {"type": config.type, "page": page}
-        if config.model_family:
-            params["model_family"] = config.model_family
+    next_page = 2
+    window = 1
+    executor: Optional[ThreadPoolExecutor] = None
+    pending: OrderedDict[int, Future] = OrderedDict()
+
+    try:
+        while True:
+            try:
+                result = None
+                prefetched = pending.pop(page, None)
+                if prefetched is not None:
+                    try:
+                        result = prefetched.result()
+                    except CacheError:
+                        logger.debug(f"Prefetch of page {page} failed, fetching it again")
+                if result is None:
+                    result = fetcher.fetch(page)
+                models, has_next_page = result
+            except CacheError as e:
+                logger.error(f"Cache error on page {page}: {str(e)}")
+                break
 
-        cache_path = get_cache_path(config, page)
-        try:
-            models, has_next_page = fetch_page_with_cache(
-                config.GITHUB_MARKETPLACE_BASE_URL,
-                params,
-                headers,
-                cache_path,
-                config.cache_timeout
-            )
-            
             for model in models:
                 total_models += 1
                 logger.debug(f"Found model {total_models} on page {page}")
-                
+
+                name = model.get("name")
+                original_name = model.get("original_name", name)
+                friendly_name = model.get("friendly_name", name)
                 yield {
-                    "id": model.get("original_name", model.get("name")),
+                    "id": original_name,
                     "registry": model.get("registry", ""),
-                    "name": model.get("friendly_name", model.get("name")),
-                    "original_name": model.get("original_name", model.get("name")),
-                    "friendly_name": model.get("friendly_name", model.get("name")),
+                    "name": friendly_name,
+                    "original_name": original_name,
+                    "friendly_name": friendly_name,
                     "task": model.get("task", "unknown"),
                     "publisher": model.get("publisher", ""),
                     "license": model.get("license", ""),
@@ -200,22 +361,81 @@ def get_marketplace_models(config: GithubModels) -> Generator[dict, None, None]:
             
             if not has_next_page or not models:
                 break
-                
+
             page += 1
             logger.debug(f"Moving to page {page}")
-            
-        except CacheError as e:
-            logger.error(f"Cache error on page {page}: {str(e)}")
-            break
 
-def save_to_json(data: List[dict], output_file: Path) -> None:
-    """Save models data to JSON file."""
+            # Only a full page suggests the listing goes on, so speculate just
+            # then, growing the window each time another full page arrives
+            if len(models) == PAGE_SIZE:
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+                else:
+                    window = min(window * 2, PREFETCH_WORKERS)
+                next_page = max(next_page, page)
+                while len(pending) < window:
+                    logger.debug(f"Prefetching page {next_page}")
+                    pending[next_page] = executor.submit(fetcher.fetch, next_page, True)
+                    next_page += 1
+    finally:
+        if executor is not None:
+            # Cancel queued speculative fetches past the last page. Ones already
+            # running are not waited on here, but their worker threads are still
+            # joined at interpreter exit; the short timeout without retries on
+            # speculative requests bounds that delay
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def stream_to_json(models: Iterable[dict], output_file: Path) -> None:
+    """
+    Write models to a JSON file as they are produced.
+
+    The output is the same as json_dumps() of the whole list, but only one
+    model is held in memory at a time. The file is written via a temporary
+    file and is not created at all when there are no models.
+
+    Only errors writing the file are logged and swallowed; in that case the
+    remaining models are still consumed. Errors raised while producing
+    models propagate to the caller.
+    """
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    f: Optional[BinaryIO] = None
+    failed = False
+    saved = False
     try:
-        logger.debug(f"Saving data to {output_file}")
-        output_file.write_text(json.dumps(data, indent=2), encoding='utf-8')
-        logger.info(f"Data saved to {output_file}")
-    except Exception as e:
-        logger.error(f"Error saving data: {str(e)}", exc_info=True)
+        for model in models:
+            if failed:
+                # Keep consuming so callers tracking the models see every one
+                continue
+            try:
+                if f is None:
+                    logger.debug(f"Streaming data to {output_file}")
+                    f = tmp_file.open('wb')
+                    f.write(b'[\n')
+                else:
+                    f.write(b',\n')
+                # Nest each element one level inside the array
+                f.write(b'  ' + json_dumps(model).replace(b'\n', b'\n  '))
+            except OSError as e:
+                failed = True
+                logger.error(f"Error saving data: {str(e)}", exc_info=True)
+
+        if f is not None and not failed:
+            try:
+                f.write(b'\n]')
+                f.close()
+                tmp_file.replace(output_file)
+                saved = True
+                logger.info(f"Data saved to {output_file}")
+            except OSError as e:
+                logger.error(f"Error saving data: {str(e)}", exc_info=True)
+    finally:
+        if f is not None:
+            f.close()
+            if not saved:
+                tmp_file.unlink(missing_ok=True)
+
+TABLE_FIELDS = ("name", "task", "model_family", "description", "page")
+DESCRIPTION_MAX_WIDTH = 103  # Longer descriptions are cut with an ellipsis
 
 def display_models(models: List[dict]) -> None:
     """Display models in a formatted table."""
@@ -227,13 +447,18 @@ def display_models(models: List[dict]) -> None:
     table.add_column("Description")
     table.add_column("Page")
 
-    for model in models:
+    # Cells are passed as Text so Rich neither parses them for markup nor
+    # misreads bracketed text in descriptions
+    get_columns = itemgetter(*TABLE_FIELDS)
+    for name, task, model_family, description, page in map(get_columns, models):
+        description = Text(description or "")
+        description.truncate(DESCRIPTION_MAX_WIDTH, overflow="ellipsis")
         table.add_row(
-            model['name'],
-            model['task'],
-            model['model_family'],
-            model['description'][:100] + '...' if len(model['description']) > 100 else model['description'],
-            str(model['page'])
+            Text(name or ""),
+            Text(task or ""),
+            Text(model_family or ""),
+            description,
+            Text(str(page))
         )
 
     console.print(table)
@@ -282,19 +507,34 @@ def main(output: Optional[Path],
     )
     
     logger.info("Fetching models from GitHub marketplace...")
-    models = list(get_marketplace_models(config))
-    
-    if not models:
+    total_models = 0
+    last_page = 0
+    table_rows: List[dict] = []
+
+    def track(models: Iterable[dict]) -> Generator[dict, None, None]:
+        # Keep only counters and the table columns instead of every full record
+        nonlocal total_models, last_page
+        for model in models:
+            total_models += 1
+            last_page = model['page']
+            if format == 'table':
+                table_rows.append({field: model[field] for field in TABLE_FIELDS})
+            yield model
+
+    models = track(get_marketplace_models(config))
+    if output:
+        stream_to_json(models, output)
+    else:
+        deque(models, maxlen=0)
+
+    if not total_models:
         logger.warning("No models found")
         return
 
     if format == 'table':
-        display_models(models)
-    
-    if output:
-        save_to_json(models, output)
-        
-    logger.info(f"Found {len(models)} models across {max(model['page'] for model in models)} pages")
+        display_models(table_rows)
+
+    logger.info(f"Found {total_models} models across {last_page} pages")
 
 if __name__ == '__main__':
     main()